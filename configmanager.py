@@ -3,13 +3,12 @@ import json
 import re
 import asyncio
 import hashlib
-import aiohttp
-import aiofiles
+import io
+import httpx
 import tempfile
 import shutil
 import subprocess
 import time
-from datetime import datetime
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.table import Table
@@ -23,104 +22,255 @@ from textual import events
 from textual.screen import Screen
 from textual.notifications import Notification
 from textual.binding import Binding
+from textual.css.query import NoMatches
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CONFIG_FILE = "config.json"
 
 # Constants
 GITHUB_API = "https://api.github.com"
-HEADERS = lambda token: {
-    "Authorization": f"token {token}",
+GITHUB_GRAPHQL = f"{GITHUB_API}/graphql"
+MAX_CONCURRENT_REQUESTS = 8  # Stay well under GitHub's secondary rate limit
+ASSET_CHUNK_SIZE = 256 * 1024  # Large chunks keep hashing in C instead of the event loop
+HTTP_TIMEOUT = 30.0  # httpx's 5 second default is too short for large compares
+STATUS_UPDATE_INTERVAL = 0.25  # Seconds between progress updates in the status bar
+
+load_dotenv()
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+# Built once and shared by every request; the session sends these by default
+_BASE_HEADERS = {
+    "Authorization": f"token {GITHUB_TOKEN}",
     "Accept": "application/vnd.github+json",
     "User-Agent": "carbonrepo-generator"
 }
+# Cache control headers to get the most up-to-date version of release assets
+# Assets are hashed as stored, so ask for them unencoded rather than decompressing on the event loop
+_ASSET_HEADERS = {**_BASE_HEADERS, "Cache-Control": "no-cache, no-store", "Pragma": "no-cache", "Accept-Encoding": "identity"}
 
-load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 console = Console()
 
-async def load_config():
+# orjson is several times faster than the stdlib for the config and API payloads.
+# The pretty variant returns bytes so the config can be written without an extra copy.
+if orjson:
+    _json_loads = orjson.loads
+    _json_dumps_pretty = lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+else:
+    _json_loads = json.loads
+    _json_dumps_pretty = lambda obj: json.dumps(obj, indent=2).encode()
+
+# config.json is small, so plain blocking I/O beats a thread-pool hop per call
+def load_config():
+    """Load config.json as a dict keyed by repo name"""
     if os.path.exists(CONFIG_FILE):
-        async with aiofiles.open(CONFIG_FILE, 'r') as f:
-            content = await f.read()
-            return json.loads(content)
-    return []
-
-async def save_config(config):
-    async with aiofiles.open(CONFIG_FILE, 'w') as f:
-        await f.write(json.dumps(config, indent=4))
+        with open(CONFIG_FILE, 'rb') as f:
+            loaded = _json_loads(f.read())
+        # On disk the config is a list of single-key dicts, which generate2.py also reads
+        if isinstance(loaded, list):
+            loaded = {repo: spec for entry in loaded for repo, spec in entry.items()}
+        # Entries written before sha/date were stored get them parsed once here
+        for spec in loaded.values():
+            if 'sha' not in spec:
+                spec['sha'], spec['date'] = parse_commit_comment(spec.get('_comment', ''))
+        return loaded
+    return {}
+
+def save_config(config):
+    # Keep the on-disk list format stable for generate2.py
+    entries = [{repo: spec} for repo, spec in config.items()]
+    with open(CONFIG_FILE, 'wb') as f:
+        f.write(_json_dumps_pretty(entries))
     console.print(f"[green]Updated {CONFIG_FILE}.[/green]\n")
 
+def keep_overrides(old_entry, new_entry):
+    """Carry the hand-maintained catalog overrides of an entry over to its refreshed version"""
+    if old_entry and 'overrides' in old_entry:
+        new_entry['overrides'] = old_entry['overrides']
+    return new_entry
+
+def parse_commit_comment(comment):
+    """Extract (sha, date) from a "Last commit on <branch>: <sha> @ <date>" comment"""
+    if ":" not in comment:
+        return None, None
+    sha, _, date = comment.split(":", 1)[1].partition(" @")
+    return sha.strip() or None, date.strip() or None
+
+_URL_RE = re.compile(r"https?://github\.com/([^/]+/[^/]+)")
+_SLUG_RE = re.compile(r"^[\w.-]+/[\w.-]+$")
+
 def parse_repo_input(text):
     if text.startswith("http"):
-        match = re.match(r"https?://github\.com/([^/]+/[^/]+)", text)
+        match = _URL_RE.match(text)
         return match.group(1) if match else None
-    elif re.match(r"^[\w.-]+/[\w.-]+$", text):
+    elif _SLUG_RE.match(text):
         return text
     return None
 
 async def fetch_asset_hash(session, url):
-    sha256 = hashlib.sha256()
+    # Integrity check only, so OpenSSL may use its faster non-FIPS path
+    sha256 = hashlib.sha256(usedforsecurity=False)
     
-    # Add cache control headers to get the most up-to-date version
-    headers = HEADERS(GITHUB_TOKEN)
-    headers['Cache-Control'] = 'no-cache, no-store'
-    headers['Pragma'] = 'no-cache'
-    
-    async with session.get(url, headers=headers) as resp:
-        if resp.status != 200:
-            raise RuntimeError(f"Failed to download {url} status={resp.status}")
+    async with session.stream("GET", url, headers=_ASSET_HEADERS) as resp:
+        if resp.status_code != 200:
+            raise RuntimeError(f"Failed to download {url} status={resp.status_code}")
         
-        async for chunk in resp.content.iter_chunked(1024):
+        async for chunk in resp.aiter_bytes(ASSET_CHUNK_SIZE):
             sha256.update(chunk)
     
     return sha256.hexdigest()
 
+# Default branch and its head commit in one round-trip instead of two REST calls
+_COMMIT_INFO_QUERY = """
+query($o: String!, $n: String!) {
+  repository(owner: $o, name: $n) {
+    defaultBranchRef {
+      name
+      target { ... on Commit { oid message author { date } } }
+    }
+  }
+}
+"""
+
+async def _gql_commit_info(session, repo_name):
+    owner, name = repo_name.split("/", 1)
+    payload = {"query": _COMMIT_INFO_QUERY, "variables": {"o": owner, "n": name}}
+    resp = await session.post(GITHUB_GRAPHQL, json=payload)
+    if resp.status_code != 200:
+        raise RuntimeError(f"GraphQL query for {repo_name} failed status={resp.status_code}")
+    body = _json_loads(resp.content)
+    
+    ref = ((body.get('data') or {}).get('repository') or {}).get('defaultBranchRef')
+    if not ref:
+        errors = "; ".join(e.get('message', '') for e in body.get('errors', []))
+        raise RuntimeError(f"No default branch found for {repo_name}: {errors or 'empty repository'}")
+    
+    commit = ref['target']
+    return {
+        'branch': ref['name'],
+        'sha': commit.get('oid', ''),
+        'date': (commit.get('author') or {}).get('date', ''),
+        'message': commit.get('message', '')
+    }
+
 async def fetch_latest_release_assets(session, repo_name):
-    repo_url = f"https://api.github.com/repos/{repo_name}"
-    resp = await session.get(repo_url, headers=HEADERS(GITHUB_TOKEN))
-    data = await resp.json()
-    default_branch = data.get('default_branch', 'main')
-    branch_url = f"{repo_url}/branches/{default_branch}"
-    resp2 = await session.get(branch_url, headers=HEADERS(GITHUB_TOKEN))
-    br = await resp2.json()
-    sha = br['commit']['sha']
-    date = br['commit']['commit']['author']['date']
-    comment = f"Last commit on {default_branch}: {sha} @ {date}"
+    info = await _gql_commit_info(session, repo_name)
+    entry = {
+        '_comment': f"Last commit on {info['branch']}: {info['sha']} @ {info['date']}",
+        'sha': info['sha'],
+        'date': info['date'],
+        'assets': {}
+    }
     rel_url = f"https://api.github.com/repos/{repo_name}/releases/latest"
-    resp3 = await session.get(rel_url, headers=HEADERS(GITHUB_TOKEN))
-    if resp3.status != 200:
-        return {}, comment
-    rel = await resp3.json()
+    resp3 = await session.get(rel_url)
+    if resp3.status_code != 200:
+        return entry
+    rel = _json_loads(resp3.content)
     assets = rel.get('assets', [])
-    hashes = {}
+    hashes = entry['assets']
+    to_download = []
     for asset in assets:
-        try:
-            h = await fetch_asset_hash(session, asset['browser_download_url'])
-        except Exception as e:
-            console.print(f"[red]Error hashing {asset['name']}: {e}[/red]")
-            h = None
+        # GitHub publishes a digest for newer assets, so there is no need to download them
+        digest = asset.get('digest') or ''
+        if digest.startswith('sha256:'):
+            hashes[asset['name']] = digest[7:]
+        else:
+            hashes[asset['name']] = None
+            to_download.append(asset)
+    
+    # Remaining assets are independent downloads, so hash them concurrently
+    results = await asyncio.gather(
+        *[fetch_asset_hash(session, a['browser_download_url']) for a in to_download],
+        return_exceptions=True
+    )
+    for asset, h in zip(to_download, results):
+        if isinstance(h, Exception):
+            console.print(f"[red]Error hashing {asset['name']}: {h}[/red]")
+            continue
         hashes[asset['name']] = h
-    return hashes, comment
+    return entry
+
+async def _single_flight(tasks, key, make_coro, keep=True):
+    """Await one shared task per key, dropping it on failure or, unless keep, once done"""
+    task = tasks.get(key)
+    if task is None:
+        task = tasks[key] = asyncio.ensure_future(make_coro())
+        if not keep:
+            task.add_done_callback(lambda _: tasks.pop(key, None))
+    try:
+        # Shielded so one cancelled caller doesn't cancel the request for everyone else
+        return await asyncio.shield(task)
+    except Exception:
+        if tasks.get(key) is task:
+            del tasks[key]
+        raise
+
+# Commit metadata never changes for a given SHA, so it is kept for the whole session
+_commit_info_cache = {}
+
+async def _request_commit_info(session, repo_name, sha):
+    resp = await session.get(f"{GITHUB_API}/repos/{repo_name}/commits/{sha}")
+    if resp.status_code != 200:
+        raise RuntimeError(f"Failed to fetch commit {sha} for {repo_name} status={resp.status_code}")
+    data = _json_loads(resp.content)
+    return {
+        'sha': data.get('sha', sha),
+        'date': data.get('commit', {}).get('author', {}).get('date', ''),
+        'message': data.get('commit', {}).get('message', '')
+    }
+
+async def fetch_commit_info(session, repo_name, sha):
+    """Fetch date and message for a commit, cached by (repo, sha)"""
+    return await _single_flight(
+        _commit_info_cache, (repo_name, sha),
+        lambda: _request_commit_info(session, repo_name, sha),
+    )
 
-async def fetch_latest_commit_info(session, repo_name):
-    repo_url = f"https://api.github.com/repos/{repo_name}"
-    resp = await session.get(repo_url, headers=HEADERS(GITHUB_TOKEN))
-    data = await resp.json()
-    default_branch = data.get('default_branch', 'main')
+# Head lookups only live while in flight; a later check must still hit GitHub
+_latest_commit_inflight = {}
+
+async def _request_latest_commit_info(session, repo_name, entry=None):
+    # The sha media type returns just the commit SHA as plain text instead of a large JSON body
+    headers = {"Accept": "application/vnd.github.sha"}
+    # An unchanged repo answers 304, which is free of rate limit and has no body to parse
+    etag = entry.get('_etag') if entry else None
+    if etag and '_latest_sha' in entry:
+        headers["If-None-Match"] = etag
     
-    branch_url = f"{repo_url}/branches/{default_branch}"
-    resp2 = await session.get(branch_url, headers=HEADERS(GITHUB_TOKEN))
-    br = await resp2.json()
+    resp = await session.get(f"{GITHUB_API}/repos/{repo_name}/commits/HEAD", headers=headers)
+    if resp.status_code == 304:
+        sha = entry['_latest_sha']
+    elif resp.status_code != 200:
+        raise RuntimeError(f"Failed to fetch latest commit for {repo_name} status={resp.status_code}")
+    else:
+        sha = resp.text.strip()
+        etag = resp.headers.get('ETag')
     
-    sha = br.get('commit', {}).get('sha', '')
-    date = br.get('commit', {}).get('commit', {}).get('author', {}).get('date', '')
-    message = br.get('commit', {}).get('commit', {}).get('message', '')
+    if entry and entry.get('sha') == sha:
+        # Nothing new since the last update, so the stored metadata is current
+        info = {'sha': sha, 'date': entry.get('date') or '', 'message': ''}
+    else:
+        # Only a changed head needs its date and message fetched
+        info = await fetch_commit_info(session, repo_name, sha)
     
-    return {
-        'sha': sha,
-        'date': date,
-        'message': message
-    }
+    if entry is not None and etag:
+        # Only the SHA is needed to answer a 304, so nothing else goes into the committed config
+        entry['_etag'] = etag
+        entry['_latest_sha'] = info['sha']
+        entry.pop('_latest', None)
+    return info
+
+async def fetch_latest_commit_info(session, repo_name, entry=None):
+    """Fetch the head commit of the default branch, reusing the entry's ETag when given"""
+    # Overlapping checks of the same repo share one request
+    return await _single_flight(
+        _latest_commit_inflight, repo_name,
+        lambda: _request_latest_commit_info(session, repo_name, entry),
+        keep=False,
+    )
 
 class RepoItem(ListItem):
     """Custom ListItem showing repo information with plain visible text indicators"""
@@ -133,26 +283,26 @@ class RepoItem(ListItem):
         self.is_loading = is_loading
         self.loading_indicator_id = f"load-{id(self)}"
         
-    def compose(self) -> ComposeResult:
-        status_text = ""
+        # Build the label once, since compose runs again whenever the list is refreshed
+        if is_loading:
+            # Loading state
+            self._display = repo_name
+            self._markup = False
+        elif is_outdated:
+            self._display = f"{repo_name.ljust(30)} [yellow](!)[/yellow]"  # Yellow warning for outdated
+            self._markup = True
+        elif is_updated:
+            self._display = f"{repo_name.ljust(30)} [green](✓)[/green]"  # Green check for updated
+            self._markup = True
+        else:
+            # Default state - no special indicator, so skip markup parsing
+            self._display = repo_name.ljust(30)
+            self._markup = False
         
-        # Determine repo display and status with color
+    def compose(self) -> ComposeResult:
+        yield Static(self._display, markup=self._markup)
         if self.is_loading:
-            # Loading state
-            display_text = f"{self.repo_name}"
-            yield Static(display_text)
             yield LoadingIndicator(id=self.loading_indicator_id)
-        else:
-            # Normal state with colored status indicators
-            if self.is_outdated:
-                status = "[yellow](!)[/yellow]"  # Yellow warning for outdated
-                yield Static(f"{self.repo_name.ljust(30)} {status}", markup=True)
-            elif self.is_updated:
-                status = "[green](✓)[/green]"  # Green check for updated
-                yield Static(f"{self.repo_name.ljust(30)} {status}", markup=True)
-            else:
-                # Default state - no special indicator
-                yield Static(f"{self.repo_name.ljust(30)}")
 
 class ConfirmationDialog(Horizontal):
     """Dialog to confirm updates"""
@@ -167,6 +317,23 @@ class ConfirmationDialog(Horizontal):
         yield Button("Yes", variant="success", name="confirm_yes")
         yield Button("No", variant="error", name="confirm_no")
 
+# Lookup tables for diff highlighting, built once rather than per line
+_MARKUP_ESCAPE = str.maketrans({"[": "\\[", "]": "\\]"})
+_DIFF_LINE_COLORS = {"@@": "cyan", "+": "green", "-": "red"}
+_DIFF_META_RE = re.compile(r"diff --git|index ")
+_DIFF_FILE_HEADER_RE = re.compile(r"--- |\+\+\+ ")
+
+def _highlight_diff_line(line, in_hunk=False):
+    # Need to escape any existing Rich markup characters to prevent rendering issues
+    line = line.translate(_MARKUP_ESCAPE)
+    # Diff metadata in yellow. ---/+++ are file headers only outside a hunk;
+    # inside one they are removed/added lines such as Lua comments
+    if _DIFF_META_RE.match(line) or (not in_hunk and _DIFF_FILE_HEADER_RE.match(line)):
+        return f"[yellow]{line}[/yellow]"
+    color = _DIFF_LINE_COLORS.get(line[:2]) or _DIFF_LINE_COLORS.get(line[:1])
+    # Normal lines remain unchanged
+    return f"[{color}]{line}[/{color}]" if color else line
+
 class DiffScreen(Screen):
     """Screen to display git diff output with proper scrolling support and syntax highlighting"""
     
@@ -183,32 +350,15 @@ class DiffScreen(Screen):
         
     def _process_diff_text(self, text):
         """Process the diff text to add syntax highlighting using Rich markup"""
-        import re
-        
-        # Split the text into lines
-        lines = text.splitlines()
         processed_lines = []
-        
-        for line in lines:
-            # Need to escape any existing Rich markup characters to prevent rendering issues
-            line = line.replace("[", "\\[").replace("]", "\\]")
-            
-            if line.startswith("+"):
-                # Added lines in green
-                processed_lines.append(f"[green]{line}[/green]")
-            elif line.startswith("-"):
-                # Removed lines in red
-                processed_lines.append(f"[red]{line}[/red]")
-            elif line.startswith("@@"):
-                # Diff headers in cyan/blue
-                processed_lines.append(f"[cyan]{line}[/cyan]")
-            elif line.startswith("diff --git") or line.startswith("index ") or line.startswith("--- ") or line.startswith("+++ "):
-                # Diff metadata in yellow
-                processed_lines.append(f"[yellow]{line}[/yellow]")
-            else:
-                # Normal lines remain unchanged
-                processed_lines.append(line)
-                
+        in_hunk = False
+        for line in text.splitlines():
+            if line.startswith("@@"):
+                in_hunk = True
+            elif not line:
+                # Hunk lines always carry a prefix, so a blank line ends the patch
+                in_hunk = False
+            processed_lines.append(_highlight_diff_line(line, in_hunk))
         return "\n".join(processed_lines)
         
     def compose(self) -> ComposeResult:
@@ -267,6 +417,7 @@ A tool to manage GitHub mod repositories and keep them updated.
 - [U] - Update all mods
 - [c] - Check for updates
 - [v] - View diff for selected mod
+- [p] - Toggle full patches in diffs
 - [r] - Refresh mod list
 - [q] - Quit
 - [h] - Show this help screen
@@ -426,6 +577,7 @@ class CarbonRepoManager(App):
         ("U", "update_all", "Update All"),
         ("c", "check_updates", "Check Updates"),
         ("v", "view_diff", "View Diff"),
+        ("p", "toggle_patches", "Patches"),
         Binding("r", "refresh", "Refresh", show=True),
         Binding("q", "quit", "Quit", show=True),
         Binding("h", "app.push_screen('help')", "Help", show=True)
@@ -436,20 +588,29 @@ class CarbonRepoManager(App):
         yield ListView(id="list_view")
         yield Container(
             Static("Ready", id="status", classes="status-message"),
-            Static(datetime.now().strftime("%H:%M:%S"), id="timestamp", classes="timestamp"),
+            Static(time.strftime("%H:%M:%S"), id="timestamp", classes="timestamp"),
             classes="status-bar")
         yield Footer()
 
     def __init__(self):
         super().__init__()
-        self.config = []
-        self.last_update_time = datetime.now()
+        self.config = {}
+        self.last_update_time = time.localtime()
         self.outdated_repos = {}  # Store repos that are out of date with their new commit info
+        self.show_patches = False  # Patch bodies dominate compare payloads, so diffs show a summary by default
 
     async def on_mount(self) -> None:
-        # create HTTP session and load configuration
-        self.session = aiohttp.ClientSession(headers=HEADERS(GITHUB_TOKEN))
-        self.config = await load_config()
+        # create HTTP/2 client, which multiplexes concurrent API calls over one connection, and load configuration
+        self.session = httpx.AsyncClient(
+            base_url=GITHUB_API,
+            headers=_BASE_HEADERS,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=HTTP_TIMEOUT,
+            # Renamed repos redirect to their new name and release downloads redirect to the asset CDN
+            follow_redirects=True
+        )
+        self.config = load_config()
         # get the ListView widget and populate
         self.list_view = self.query_one(ListView)
         await self.refresh_list()
@@ -461,7 +622,7 @@ class CarbonRepoManager(App):
     async def action_refresh(self) -> None:
         """Refresh the list view"""
         self.notify("Refreshing mods", title="Refresh")
-        self.config = await load_config()
+        self.config = load_config()
         await self.refresh_list()
         self.update_status("Mods list refreshed")
 
@@ -480,9 +641,9 @@ class CarbonRepoManager(App):
             repo_name = parse_repo_input(self.query_one(Input).value)
             if repo_name:
                 self.update_status(f"Adding mod {repo_name}...")
-                hashes, comment = await fetch_latest_release_assets(self.session, repo_name)
-                self.config = [e for e in self.config if repo_name not in e] + [{repo_name:{'_comment':comment,'assets':hashes}}]
-                await save_config(self.config)
+                entry = await fetch_latest_release_assets(self.session, repo_name)
+                self.config[repo_name] = keep_overrides(self.config.get(repo_name), entry)
+                save_config(self.config)
                 await self.refresh_list()
                 self.update_status(f"Added mod {repo_name}")
                 self.notify(f"Mod {repo_name} added", title="Success")
@@ -493,36 +654,30 @@ class CarbonRepoManager(App):
             await dialog.remove()  # Use the dialog's remove method directly
             
         elif button.name == "confirm_yes":
-            # Get the dialog through the button's parent container
-            dialog = button.parent
-            while dialog and dialog.id != "confirm_dialog":
-                dialog = dialog.parent
-                
-            # If we found the dialog, process accordingly
-            if dialog:
-                if hasattr(dialog, "update_all") and dialog.update_all:
-                    # Start the update all process
-                    asyncio.create_task(self._update_all_worker())
-                elif hasattr(dialog, "repo_idx"):
-                    # Start the update process for a single repo
-                    asyncio.create_task(self._update_repo_worker(dialog.repo_idx))
-                # Remove the dialog using dialog's own remove method
-                await dialog.remove()  # Use the dialog's remove method directly
-            else:
+            try:
+                dialog = self.query_one("#confirm_dialog")
+            except NoMatches:
                 self.notify("Could not find the dialog", severity="error")
+                return
+                
+            if hasattr(dialog, "update_all") and dialog.update_all:
+                # Start the update all process
+                asyncio.create_task(self._update_all_worker())
+            elif dialog.repo_name in self.config:
+                # Start the update process for a single repo
+                asyncio.create_task(self._update_repo_worker(dialog.repo_name))
+            # Remove the dialog using dialog's own remove method
+            await dialog.remove()  # Use the dialog's remove method directly
             
         elif button.name == "confirm_no":
-            # Get the dialog through the button's parent container  
-            dialog = button.parent
-            while dialog and dialog.id != "confirm_dialog":
-                dialog = dialog.parent
-                
-            # If we found the dialog, remove it
-            if dialog:
-                await dialog.remove()  # Use the dialog's remove method directly
-                self.update_status("Update cancelled")
-            else:
+            try:
+                dialog = self.query_one("#confirm_dialog")
+            except NoMatches:
                 self.notify("Could not find the dialog", severity="error")
+                return
+                
+            await dialog.remove()  # Use the dialog's remove method directly
+            self.update_status("Update cancelled")
 
     async def on_key(self, event: events.Key) -> None:
         """Handle key press events"""
@@ -534,22 +689,26 @@ class CarbonRepoManager(App):
                 await add_dialog[0].remove()
                 self.update_status("Add mod cancelled")
 
-    async def action_remove_repo(self) -> None:
+    def _selected_repo(self):
+        """Return the repo name of the highlighted list item, if any"""
         idx = self.list_view.index or 0
         if 0 <= idx < len(self.config):
-            repo = list(self.config[idx].keys())[0]
-            del self.config[idx]
-            await save_config(self.config)
+            return list(self.config)[idx]
+        return None
+
+    async def action_remove_repo(self) -> None:
+        repo = self._selected_repo()
+        if repo:
+            del self.config[repo]
+            save_config(self.config)
             await self.refresh_list()
             self.notify(f"Removed {repo}", title="Mod Removed")
             self.update_status(f"Removed {repo}")
 
     async def action_update_repo(self) -> None:
         """Request confirmation before updating a mod"""
-        idx = self.list_view.index or 0
-        if 0 <= idx < len(self.config):
-            repo = list(self.config[idx].keys())[0]
-            
+        repo = self._selected_repo()
+        if repo:
             # Check if there are updates available
             if repo in self.outdated_repos:
                 old_sha = self.outdated_repos[repo]['old_sha']
@@ -561,17 +720,14 @@ class CarbonRepoManager(App):
                 
             # Show confirmation dialog
             dialog = ConfirmationDialog(repo, message)
-            dialog.repo_idx = idx  # Store index for later use
             await self.mount(dialog)
         else:
             self.notify("No mod selected", severity="warning")
 
-    async def _update_repo_worker(self, idx: int) -> None:
-        # Store original repo item
-        repo = list(self.config[idx].keys())[0]
+    async def _update_repo_worker(self, repo: str) -> None:
+        idx = list(self.config).index(repo)
         self.update_status(f"Updating {repo}...")
-        old_comment = self.config[idx][repo].get('_comment', '')
-        old_sha = old_comment.split()[3] if old_comment else None
+        old_sha = self.config[repo].get('sha')
         
         # Replace the list item with a loading version
         if idx < len(self.list_view.children):
@@ -580,10 +736,10 @@ class CarbonRepoManager(App):
             loading_item = RepoItem(f"{repo} [LOADING]", is_loading=True)
             await self.list_view.mount(loading_item, before=idx)  # Use mount instead of insert
         
-        # Fetch new assets and comment
+        # Fetch new assets and commit info
         try:
-            hashes, comment = await fetch_latest_release_assets(self.session, repo)
-            new_sha = comment.split()[3]
+            entry = await fetch_latest_release_assets(self.session, repo)
+            new_sha = entry['sha']
             
             # If SHA changed, generate diff in background
             if old_sha and new_sha != old_sha:
@@ -592,8 +748,8 @@ class CarbonRepoManager(App):
                 await self._show_repo_diff(repo, old_sha, new_sha)
             
             # Update config and UI
-            self.config[idx] = {repo:{'_comment':comment,'assets':hashes}}
-            await save_config(self.config)
+            self.config[repo] = keep_overrides(self.config.get(repo), entry)
+            save_config(self.config)
             
             # Remove from outdated repos dictionary since it's now updated
             if repo in self.outdated_repos:
@@ -627,35 +783,41 @@ class CarbonRepoManager(App):
     async def _update_all_worker(self) -> None:
         update_count = 0
         error_count = 0
-        original_items = {}  # Store original items to restore later
         
         # First, replace all items with loading indicators
-        for i, entry in enumerate(self.config):
-            repo = list(entry.keys())[0]
-            # Keep reference to the original list item for later restoration
-            original_items[repo] = i
-            
+        for i, repo in enumerate(self.config):
             # Replace list item with loading indicator
             if i < len(self.list_view.children):
                 self.list_view.children[i].remove()
                 loading_item = RepoItem(f"{repo} [LOADING...]", is_loading=True)
                 self.list_view.insert(i, loading_item)
         
-        # Now process each repo
-        for i, entry in enumerate(self.config):
-            repo = list(entry.keys())[0]
-            self.update_status(f"Updating {repo}...")
-            
+        # Now process every repo concurrently, bounded by the semaphore
+        sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.update_status(f"Updating {len(self.config)} mods...")
+
+        async def _update_one(repo, sem):
             try:
-                hashes, comment = await fetch_latest_release_assets(self.session, repo)
-                self.config[i] = {repo:{'_comment':comment,'assets':hashes}}
-                update_count += 1
+                async with sem:
+                    return repo, await fetch_latest_release_assets(self.session, repo)
             except Exception as e:
-                console.print(f"[red]Error updating {repo}: {e}[/red]")
+                return repo, e
+
+        results = await asyncio.gather(*[_update_one(repo, sem) for repo in self.config])
+
+        for repo, result in results:
+            # A repo deleted while the update ran must not be put back
+            if repo not in self.config:
+                continue
+            if isinstance(result, Exception):
+                console.print(f"[red]Error updating {repo}: {result}[/red]")
                 error_count += 1
+                continue
+            self.config[repo] = keep_overrides(self.config.get(repo), result)
+            update_count += 1
         
         # Save and refresh the list with updated status
-        await save_config(self.config)
+        save_config(self.config)
         await self.refresh_list()
         
         self.update_status(f"{update_count} mods updated, {error_count} errors")
@@ -665,7 +827,7 @@ class CarbonRepoManager(App):
             self.notify(f"{update_count} updated, {error_count} failed", title="Update Partial", severity="warning")
 
     async def action_check_updates(self) -> None:
-        """Check all mods for updates without modifying the config"""
+        """Check all mods for updates, rewriting config.json when their cached ETags change"""
         console.print("[yellow]Checking all mods for updates...[/yellow]")
         asyncio.create_task(self._check_updates_worker())
     
@@ -682,98 +844,99 @@ class CarbonRepoManager(App):
         # Update the status bar but don't modify the list items yet
         self.update_status(f"Checking {total_count} mods for updates...")
         
-        # Process each repo without changing the UI during checks
-        for i, entry in enumerate(self.config):
-            repo = list(entry.keys())[0]
-            
-            # Update status message to show progress
-            self.update_status(f"Checking {repo} ({i+1}/{total_count})...")
-            
+        # Check every repo concurrently without changing the UI during checks
+        sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        checked = 0
+        etags_changed = False
+        last_status = time.monotonic()
+
+        async def _check_one(repo, entry, sem):
+            nonlocal checked, etags_changed, last_status
+            # Both keys are compared so entries still carrying the old _latest get migrated and saved
+            old_etag = (entry.get('_etag'), entry.get('_latest_sha'))
             try:
-                # Get current commit info from config
-                old_comment = self.config[i][repo].get('_comment', '')
-                # Extract SHA more carefully - handle potential format differences
-                try:
-                    # Format: "Last commit on main: SHA @ DATE"
-                    old_sha = old_comment.split(":", 1)[1].strip().split(" @")[0].strip() if ":" in old_comment else None
-                except Exception:
-                    # Fallback to simpler splitting if the format is unexpected
-                    parts = old_comment.split()
-                    old_sha = parts[3] if len(parts) > 3 else None
-                
-                # Fetch latest commit info without downloading assets
-                new_commit_info = await self._fetch_latest_commit_info(repo)
-                new_sha = new_commit_info.get('sha')
-                
-                # If SHA changed, repo is outdated - do careful comparison
-                if old_sha and new_sha and old_sha != new_sha:
-                    # Double-check they're not just different forms of the same SHA
-                    if old_sha.lower() != new_sha.lower() and not new_sha.startswith(old_sha) and not old_sha.startswith(new_sha):
-                        self.outdated_repos[repo] = {
-                            'old_sha': old_sha,
-                            'new_sha': new_sha,
-                            'commit_date': new_commit_info.get('date', ''),
-                            'message': new_commit_info.get('message', ''),
-                            'index': i
-                        }
-                        outdated_count += 1
-                        console.print(f"[bold yellow]⚠️ {repo} is outdated![/bold yellow]")
-                    else:
-                        update_count += 1
-                else:
-                    update_count += 1
+                async with sem:
+                    # Fetch latest commit info without downloading assets
+                    result = await self._fetch_latest_commit_info(repo, entry)
+                etags_changed = etags_changed or (entry.get('_etag'), entry.get('_latest_sha')) != old_etag
             except Exception as e:
-                error_msg = str(e)
-                console.print(f"[red]Error checking {repo}: {error_msg}[/red]")
+                result = e
+            checked += 1
+            # Update status message to show progress, throttled to limit re-renders
+            now = time.monotonic()
+            if now - last_status > STATUS_UPDATE_INTERVAL:
+                last_status = now
+                self.update_status(f"Checked {repo} ({checked}/{total_count})...")
+            return repo, result
+
+        results = await asyncio.gather(*[_check_one(repo, e, sem) for repo, e in self.config.items()])
+
+        # Console output is buffered and printed once so Rich rendering stays out of the loop
+        summary_lines = []
+        for repo, new_commit_info in results:
+            # The check runs in the background, so a repo may have been deleted meanwhile
+            if repo not in self.config:
+                continue
+            if isinstance(new_commit_info, Exception):
+                summary_lines.append(f"[red]Error checking {repo}: {new_commit_info}[/red]")
                 error_count += 1
-                
-            # Small delay to avoid GUI freezing
-            await asyncio.sleep(0.05)
+                continue
+
+            # Get current commit info from config
+            old_sha = self.config[repo].get('sha')
+            new_sha = new_commit_info.get('sha')
+
+            # If SHA changed, repo is outdated. Both SHAs are full lowercase hex
+            # from GitHub, so a plain comparison is enough.
+            if old_sha and new_sha and old_sha != new_sha:
+                self.outdated_repos[repo] = {
+                    'old_sha': old_sha,
+                    'new_sha': new_sha,
+                    'commit_date': new_commit_info.get('date', ''),
+                    'message': new_commit_info.get('message', '')
+                }
+                outdated_count += 1
+                summary_lines.append(f"[bold yellow]⚠️ {repo} is outdated![/bold yellow]")
+            else:
+                update_count += 1
         
+        # Persist fresh ETags so the next check can use conditional requests
+        if etags_changed:
+            save_config(self.config)
+
         # After checking all repos, refresh the list to show outdated status
         await self.refresh_list()
         
         # Show summary
         if outdated_count > 0:
             self.update_status(f"Found {outdated_count} outdated mods")
-            console.print(f"[yellow]== {outdated_count} mods need updates ==[/yellow]")
+            summary_lines.append(f"[yellow]== {outdated_count} mods need updates ==[/yellow]")
             for repo, info in self.outdated_repos.items():
-                console.print(f"[yellow]  - {repo}[/yellow] (last update: {info['commit_date']})")
-                console.print(f"    {info['message'][:60]}{'...' if len(info['message']) > 60 else ''}")
-                console.print(f"    Old: {info['old_sha'][:8]}  New: {info['new_sha'][:8]}")
+                summary_lines.append(f"[yellow]  - {repo}[/yellow] (last update: {info['commit_date']})")
+                summary_lines.append(f"    {info['message'][:60]}{'...' if len(info['message']) > 60 else ''}")
+                summary_lines.append(f"    Old: {info['old_sha'][:8]}  New: {info['new_sha'][:8]}")
                 
             self.notify(f"Found {outdated_count} mods with updates available", title="Updates Available")
         else:
             self.update_status(f"All {update_count} mods are up-to-date")
             self.notify("All mods are up-to-date", title="No Updates")
+        
+        if summary_lines:
+            console.print("\n".join(summary_lines))
 
-    async def _fetch_latest_commit_info(self, repo_name):
+    async def _fetch_latest_commit_info(self, repo_name, entry=None):
         """Fetch the latest commit info for a repo without downloading assets"""
-        repo_url = f"https://api.github.com/repos/{repo_name}"
-        resp = await self.session.get(repo_url, headers=HEADERS(GITHUB_TOKEN))
-        data = await resp.json()
-        default_branch = data.get('default_branch', 'main')
-        
-        branch_url = f"{repo_url}/branches/{default_branch}"
-        resp2 = await self.session.get(branch_url, headers=HEADERS(GITHUB_TOKEN))
-        br = await resp2.json()
-        
-        sha = br.get('commit', {}).get('sha', '')
-        date = br.get('commit', {}).get('commit', {}).get('author', {}).get('date', '')
-        message = br.get('commit', {}).get('commit', {}).get('message', '')
-        
-        return {
-            'sha': sha,
-            'date': date,
-            'message': message
-        }
+        return await fetch_latest_commit_info(self.session, repo_name, entry)
+
+    def action_toggle_patches(self) -> None:
+        """Toggle whether diffs include each file's full patch"""
+        self.show_patches = not self.show_patches
+        self.notify(f"Full patches {'shown' if self.show_patches else 'hidden'} in diffs opened from now on", title="Diff")
 
     async def action_view_diff(self) -> None:
         """View git diff for the selected mods"""
-        idx = self.list_view.index or 0
-        if 0 <= idx < len(self.config):
-            repo = list(self.config[idx].keys())[0]
-            
+        repo = self._selected_repo()
+        if repo:
             # Check if this repo is outdated
             if repo in self.outdated_repos:
                 self.update_status(f"Generating diff for {repo}...")
@@ -786,21 +949,13 @@ class CarbonRepoManager(App):
                 # Check if repo is outdated first
                 self.update_status(f"Checking if {repo} has updates...")
                 
-                # Get current commit info from config with improved SHA extraction
-                old_comment = self.config[idx].get(repo, {}).get('_comment', '')
-                
-                # Extract SHA from comment with format: "Last commit on main: SHA @ DATE"
-                old_sha = None
-                if ":" in old_comment:
-                    try:
-                        old_sha = old_comment.split(":", 1)[1].strip().split(" @")[0].strip()
-                    except Exception:
-                        pass
+                # Get current commit info from config
+                old_sha = self.config[repo].get('sha')
                 
                 if old_sha:
                     # Fetch latest commit info
                     try:
-                        new_commit_info = await fetch_latest_commit_info(self.session, repo)
+                        new_commit_info = await fetch_latest_commit_info(self.session, repo, self.config[repo])
                         new_sha = new_commit_info.get('sha')
                         
                         if new_sha and new_sha != old_sha:
@@ -808,8 +963,7 @@ class CarbonRepoManager(App):
                                 'old_sha': old_sha,
                                 'new_sha': new_sha,
                                 'commit_date': new_commit_info.get('date', ''),
-                                'message': new_commit_info.get('message', ''),
-                                'index': idx
+                                'message': new_commit_info.get('message', '')
                             }
                             
                             await self._show_repo_diff(repo, old_sha, new_sha)
@@ -835,66 +989,69 @@ class CarbonRepoManager(App):
             # First try using GitHub's compare API to get the diff between commits
             compare_url = f"https://api.github.com/repos/{repo}/compare/{old_sha}...{new_sha}"
             
-            async with self.session.get(compare_url, headers=HEADERS(GITHUB_TOKEN)) as resp:
-                if resp.status == 404:
-                    # Handle 404 Not Found error - try alternative approach
-                    self.update_status(f"Cannot directly compare these commits. Trying alternative approach...")
-                    await self._show_repo_diff_alternative(repo, old_sha, new_sha)
-                    return
-                    
-                elif resp.status != 200:
-                    error_text = await resp.text()
-                    self.notify(f"Failed to fetch diff: {resp.status} - {error_text}", severity="error")
-                    return
-                    
-                # Continue with normal processing if we got a 200 OK
-                compare_data = await resp.json()
+            resp = await self.session.get(compare_url)
+            if resp.status_code == 404:
+                # Handle 404 Not Found error - try alternative approach
+                self.update_status(f"Cannot directly compare these commits. Trying alternative approach...")
+                await self._show_repo_diff_alternative(repo, old_sha, new_sha)
+                return
                 
-                # Build a formatted diff output
-                diff_text = []
-                diff_text.append(f"Comparing {old_sha[:8]} to {new_sha[:8]} - {compare_data.get('status', '')}")
-                diff_text.append(f"Total changes: {compare_data.get('total_commits', 0)} commit(s)")
-                diff_text.append(f"Files changed: {compare_data.get('files', []).__len__()}")
-                diff_text.append("")
+            elif resp.status_code != 200:
+                error_text = resp.text
+                self.notify(f"Failed to fetch diff: {resp.status_code} - {error_text}", severity="error")
+                return
                 
-                # Add commit messages
-                if 'commits' in compare_data:
-                    diff_text.append("COMMITS:")
-                    for commit in compare_data['commits']:
-                        commit_date = commit.get('commit', {}).get('author', {}).get('date', '')
-                        commit_message = commit.get('commit', {}).get('message', '').split('\n')[0]  # First line only
-                        commit_sha = commit.get('sha', '')[:8]
-                        author = commit.get('commit', {}).get('author', {}).get('name', '')
-                        diff_text.append(f"{commit_sha} {commit_date} {author}: {commit_message}")
-                    diff_text.append("")
+            # Continue with normal processing if we got a 200 OK
+            compare_data = _json_loads(resp.content)
+            
+            files = compare_data.get('files') or ()
+            
+            # Build a formatted diff output, written straight into one buffer
+            buf = io.StringIO()
+            buf.write(f"Comparing {old_sha[:8]} to {new_sha[:8]} - {compare_data.get('status', '')}\n")
+            buf.write(f"Total changes: {compare_data.get('total_commits', 0)} commit(s)\n")
+            buf.write(f"Files changed: {len(files)}\n\n")
+            
+            # Add commit messages
+            if 'commits' in compare_data:
+                buf.write("COMMITS:\n")
+                for commit in compare_data['commits']:
+                    commit_date = commit.get('commit', {}).get('author', {}).get('date', '')
+                    commit_message = commit.get('commit', {}).get('message', '').split('\n')[0]  # First line only
+                    commit_sha = commit.get('sha', '')[:8]
+                    author = commit.get('commit', {}).get('author', {}).get('name', '')
+                    buf.write(f"{commit_sha} {commit_date} {author}: {commit_message}\n")
+                buf.write("\n")
+            
+            # Add file changes
+            if files:
+                buf.write("CHANGED FILES:\n")
+                for file in files:
+                    status = file.get('status', '')
+                    filename = file.get('filename', '')
+                    changes = f"+{file.get('additions', 0)} -{file.get('deletions', 0)}"
+                    buf.write(f"{status}: {filename} ({changes})\n")
                 
-                # Add file changes
-                if 'files' in compare_data:
-                    diff_text.append("CHANGED FILES:")
-                    for file in compare_data['files']:
-                        status = file.get('status', '')
-                        filename = file.get('filename', '')
-                        changes = f"+{file.get('additions', 0)} -{file.get('deletions', 0)}"
-                        diff_text.append(f"{status}: {filename} ({changes})")
-                    
+                if self.show_patches:
                     # For each file, add the patch if available (the actual diff content)
-                    diff_text.append("\nDIFF DETAILS:")
-                    for file in compare_data['files']:
+                    buf.write("\nDIFF DETAILS:\n")
+                    for file in files:
                         filename = file.get('filename', '')
                         patch = file.get('patch', '')
                         if patch:
-                            diff_text.append(f"\n--- {filename}")
-                            diff_text.append(f"+++ {filename}")
-                            diff_text.append(patch)
-                
-                # Join all lines with newlines
-                full_diff = "\n".join(diff_text)
-                
-                # Show diff in the TUI by pushing a new screen with markup disabled
-                title = f"Diff {repo}: {old_sha[:8]} → {new_sha[:8]}"
-                await self.push_screen(DiffScreen(full_diff, title))
-                self.update_status(f"Displayed diff for {repo}")
-                
+                            buf.write(f"\n--- {filename}\n+++ {filename}\n")
+                            buf.write(patch)
+                            buf.write("\n")
+                else:
+                    buf.write("\nFull patches hidden. Press p, then reopen the diff to include them.\n")
+            
+            full_diff = buf.getvalue()
+            
+            # Show diff in the TUI by pushing a new screen with markup disabled
+            title = f"Diff {repo}: {old_sha[:8]} → {new_sha[:8]}"
+            await self.push_screen(DiffScreen(full_diff, title))
+            self.update_status(f"Displayed diff for {repo}")
+            
         except Exception as e:
             error_msg = str(e)
             self.notify(f"Error fetching diff: {error_msg}", severity="error")
@@ -910,34 +1067,21 @@ class CarbonRepoManager(App):
             diff_text.append(f"Changes between {old_sha[:8]} and {new_sha[:8]}")
             diff_text.append("Note: Direct comparison not available. Showing summary information.\n")
             
-            # Fetch info about old commit
-            old_commit_url = f"https://api.github.com/repos/{repo}/commits/{old_sha}"
-            new_commit_url = f"https://api.github.com/repos/{repo}/commits/{new_sha}"
-            
-            # Get old commit details
-            async with self.session.get(old_commit_url, headers=HEADERS(GITHUB_TOKEN)) as resp:
-                if resp.status != 200:
-                    self.notify(f"Failed to fetch old commit: {resp.status}", severity="error")
-                    return
-                    
-                old_commit = await resp.json()
-                old_date = old_commit.get('commit', {}).get('author', {}).get('date', 'unknown date')
-                old_msg = old_commit.get('commit', {}).get('message', '').split('\n')[0]
-                diff_text.append(f"OLD COMMIT: {old_sha[:8]} ({old_date})")
-                diff_text.append(f"Message: {old_msg}")
-                diff_text.append("")
+            # Fetch both commits concurrently; the new one is usually cached from the update check
+            results = await asyncio.gather(
+                fetch_commit_info(self.session, repo, old_sha),
+                fetch_commit_info(self.session, repo, new_sha),
+                return_exceptions=True
+            )
             
-            # Get new commit details
-            async with self.session.get(new_commit_url, headers=HEADERS(GITHUB_TOKEN)) as resp:
-                if resp.status != 200:
-                    self.notify(f"Failed to fetch new commit: {resp.status}", severity="error")
-                    return
-                    
-                new_commit = await resp.json()
-                new_date = new_commit.get('commit', {}).get('author', {}).get('date', 'unknown date')
-                new_msg = new_commit.get('commit', {}).get('message', '').split('\n')[0]
-                diff_text.append(f"NEW COMMIT: {new_sha[:8]} ({new_date})")
-                diff_text.append(f"Message: {new_msg}")
+            # The SHAs are authoritative, so a failed lookup only loses the details, not the links below
+            for label, sha, info in zip(("OLD", "NEW"), (old_sha, new_sha), results):
+                if isinstance(info, Exception):
+                    diff_text.append(f"{label} COMMIT: {sha[:8]} (details unavailable: {info})")
+                else:
+                    first_line = info['message'].split('\n')[0]
+                    diff_text.append(f"{label} COMMIT: {sha[:8]} ({info['date'] or 'unknown date'})")
+                    diff_text.append(f"Message: {first_line}")
                 diff_text.append("")
             
             # Add information about how to see the full changes
@@ -962,35 +1106,30 @@ class CarbonRepoManager(App):
         """Refresh the list view with updated repo status indicators"""
         self.list_view.clear()
         
-        for i, e in enumerate(self.config):
-            repo_name = list(e.keys())[0]
-            # Check if repo is in outdated_repos dictionary
-            is_outdated = repo_name in self.outdated_repos
-            
-            # Debug output to console to verify outdated status
-            if is_outdated:
-                console.print(f"[yellow]Marking {repo_name} as outdated[/yellow]")
-                
-            # Create a RepoItem with proper status indicators
-            item = RepoItem(repo_name, is_outdated=is_outdated)
-            self.list_view.append(item)
+        # Debug output to the Textual log to verify outdated status
+        for repo_name in self.outdated_repos:
+            self.log(f"Marking {repo_name} as outdated")
+        
+        # Create every RepoItem up front and mount them in one batch instead of one append per repo
+        items = [RepoItem(repo_name, is_outdated=repo_name in self.outdated_repos) for repo_name in self.config]
+        self.list_view.extend(items)
             
         self.list_view.focus()
 
     def update_status(self, message: str) -> None:
         """Update the status bar with a message and current timestamp"""
-        now = datetime.now()
+        now = time.localtime()
         self.last_update_time = now
         
         status = self.query_one("#status")
         timestamp = self.query_one("#timestamp")
         
         status.update(message)
-        timestamp.update(now.strftime("%H:%M:%S"))
+        timestamp.update(time.strftime("%H:%M:%S", now))
 
     async def action_quit(self) -> None:
         # close HTTP session and exit
-        await self.session.close()
+        await self.session.aclose()
         self.exit()
 
 if __name__ == '__main__':
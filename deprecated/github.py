@@ -10,6 +10,10 @@ class GitHub():
             }
         else:
             self.headers = {}
+        
+        # Reuse one pooled session so repeated calls skip the TCP+TLS handshake
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
             
     def set_repo(self, owner: str, repo: str):
         self.uowner = owner
@@ -17,7 +21,7 @@ class GitHub():
         
     def get(self, url: str):
         try:
-            response = requests.get(url, headers=self.headers)
+            response = self._session.get(url)
             response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
@@ -46,7 +50,7 @@ class GitHub():
         owner = owner or self.uowner
         repo = repo or self.urepo
         html_url = f"https://github.com/{owner}/{repo}"
-        html = requests.get(html_url).text
+        html = self._session.get(html_url).text
         
         soup = bs4.BeautifulSoup(html, "html.parser")
         meta_tags = soup.find_all("meta", property="og:image")
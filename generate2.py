@@ -2,90 +2,230 @@ import os
 import sys
 import json
 import hashlib
+import random
+import time
 import asyncio
-import aiohttp
+import httpx
 import aiofiles
 import re
+from html import unescape
 from tqdm.asyncio import tqdm
 from dotenv import load_dotenv
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Constants
 GITHUB_API = "https://api.github.com"
-HEADERS = lambda token: {
-    "Authorization": f"token {token}",
+GITHUB_GRAPHQL = f"{GITHUB_API}/graphql"
+GRAPHQL_BATCH_SIZE = 20  # Repos fetched per aliased GraphQL document
+ASSET_CHUNK_SIZE = 256 * 1024  # Big enough for hashlib to release the GIL and run SHA-NI uninterrupted
+ASSET_DOWNLOAD_CONCURRENCY = 4  # Concurrent asset downloads, so bandwidth isn't split too thin
+MAX_CONCURRENT_REPOS = 32  # HTTP/2 multiplexes these over a single connection to api.github.com
+HTTP_TIMEOUT = 30.0
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_MAX_WAIT = 300  # Seconds; a longer wait fails the request instead of stalling the whole run
+CACHE_DIR = ".cache"
+ETAG_CACHE_FILE = os.path.join(CACHE_DIR, "gh-etag.json")
+ASSET_CACHE_FILE = os.path.join(CACHE_DIR, "asset-etags.json")
+
+load_dotenv()
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+
+# Built once and set on the clients, so requests don't pass headers of their own
+_HEADERS = {
     "Accept": "application/vnd.github+json",
     "User-Agent": "carbonrepo-generator"
 }
 
-load_dotenv()
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+def _token_auth(request):
+    # Client-wide auth rather than a default header, so a request can opt out with auth=None
+    request.headers["Authorization"] = f"token {GITHUB_TOKEN}"
+    return request
+
+# Cache control headers to get the most up-to-date version of release assets.
+# Assets are hashed as stored, so they're not compressed in transit and inflated on the event loop;
+# identity encoding also keeps a HEAD's Content-Length the size of the stored file.
+_ASSET_HEADERS = {**_HEADERS, "Cache-Control": "no-cache, no-store", "Pragma": "no-cache", "Accept-Encoding": "identity"}
+# The repo page is fetched for its og:image, anonymously as before; the API media type
+# would get JSON back instead of HTML
+_PAGE_HEADERS = {"Accept": "text/html"}
+
+# orjson parses and encodes several times faster than the stdlib and works in bytes directly
+if orjson:
+    _json_loads = orjson.loads
+    _json_dumps_pretty = lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+else:
+    _json_loads = json.loads
+    _json_dumps_pretty = lambda obj: json.dumps(obj, indent=2).encode()
+
+# --- Rate limiting ---
+
+def _rate_limit_delay(resp, attempt):
+    # Seconds to wait before retrying resp, or None if it wasn't rate limited
+    if resp.status_code not in (403, 429):
+        return None
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    if resp.headers.get("X-RateLimit-Remaining") == "0":
+        return max(0.0, float(resp.headers.get("X-RateLimit-Reset", 0)) - time.time())
+    if resp.status_code == 429:
+        return 2 ** attempt
+    # Any other 403 is a permission problem that retrying won't fix
+    return None
+
+async def request_with_backoff(session, method, url, **kwargs):
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        resp = await session.request(method, url, **kwargs)
+        delay = _rate_limit_delay(resp, attempt)
+        if delay is None or attempt == RATE_LIMIT_RETRIES or delay > RATE_LIMIT_MAX_WAIT:
+            return resp
+        # Jitter keeps concurrent repos from all retrying in the same instant
+        await asyncio.sleep(delay + random.uniform(0, 1))
+
+# --- Conditional request cache ---
+
+# url -> {"etag": ..., "body_path": ...}, persisted between runs so unchanged
+# resources come back as 304s, which cost no rate limit and carry no body
+_etag_cache = {}
+# asset url -> {"etag": ..., "size": ..., "sha256": ...}, so unchanged assets are not re-downloaded
+_asset_cache = {}
+
+async def load_etag_cache():
+    global _etag_cache, _asset_cache
+    if os.path.exists(ETAG_CACHE_FILE):
+        async with aiofiles.open(ETAG_CACHE_FILE, "rb") as f:
+            _etag_cache = _json_loads(await f.read())
+    if os.path.exists(ASSET_CACHE_FILE):
+        async with aiofiles.open(ASSET_CACHE_FILE, "rb") as f:
+            _asset_cache = _json_loads(await f.read())
+
+async def save_etag_cache():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    async with aiofiles.open(ETAG_CACHE_FILE, "wb") as f:
+        await f.write(_json_dumps_pretty(_etag_cache))
+    async with aiofiles.open(ASSET_CACHE_FILE, "wb") as f:
+        await f.write(_json_dumps_pretty(_asset_cache))
+
+async def fetch_cached(session, url, **kwargs):
+    # Returns (status, body); a 304 is answered from the cached body as a 200
+    cached = _etag_cache.get(url)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if cached and os.path.exists(cached["body_path"]):
+        headers["If-None-Match"] = cached["etag"]
+
+    resp = await request_with_backoff(session, "GET", url, headers=headers, **kwargs)
+    if resp.status_code == 304:
+        async with aiofiles.open(cached["body_path"], "rb") as f:
+            return 200, await f.read()
+    body = resp.content
+    etag = resp.headers.get("ETag")
+
+    if resp.status_code == 200 and etag:
+        body_path = os.path.join(CACHE_DIR, hashlib.sha256(url.encode()).hexdigest())
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        async with aiofiles.open(body_path, "wb") as f:
+            await f.write(body)
+        _etag_cache[url] = {"etag": etag, "body_path": body_path}
+    return resp.status_code, body
 
 # --- Utilities ---
 
+async def _fetch_json(session, url, **kwargs):
+    status, body = await fetch_cached(session, url, **kwargs)
+    if status != 200:
+        raise Exception(f"HTTP {status} for {url}: {body.decode(errors='replace')}")
+    return _json_loads(body)
+
+# url -> task, so concurrent and repeated requests for a URL within a run share one fetch
+_inflight = {}
+
 async def fetch_json(session, url, **kwargs):
-    async with session.get(url, **kwargs) as resp:
-        if resp.status != 200:
-            text = await resp.text()
-            raise Exception(f"HTTP {resp.status} for {url}: {text}")
-        return await resp.json()
+    task = _inflight.get(url)
+    if task is None:
+        task = _inflight[url] = asyncio.ensure_future(_fetch_json(session, url, **kwargs))
+    try:
+        # Shielded so one cancelled caller doesn't cancel the fetch for everyone else
+        return await asyncio.shield(task)
+    except Exception:
+        # Failures aren't memoized, a later call gets to try again
+        if _inflight.get(url) is task:
+            del _inflight[url]
+        raise
 
 async def fetch_content(session, url, **kwargs):
-    async with session.get(url, **kwargs) as resp:
-        if resp.status != 200:
-            text = await resp.text()
-            raise Exception(f"Download failed {resp.status} {url}: {text}")
-        return await resp.read()
+    resp = await session.get(url, **kwargs)
+    if resp.status_code != 200:
+        raise Exception(f"Download failed {resp.status_code} {url}: {resp.text}")
+    return resp.content
 
 async def fetch_stream_hash(session, url, **kwargs):
+    loop = asyncio.get_running_loop()
     sha256 = hashlib.sha256()
+    pending = None
     
-    # Add cache control headers to get the most up-to-date version
-    headers = kwargs.get('headers', {})
-    headers['Cache-Control'] = 'no-cache, no-store'
-    headers['Pragma'] = 'no-cache'
-    
-    async with session.get(url, **kwargs) as resp:
-        if resp.status != 200:
-            text = await resp.text()
-            raise Exception(f"Download failed {resp.status} {url}: {text}")
+    async with session.stream("GET", url, **kwargs) as resp:
+        if resp.status_code != 200:
+            await resp.aread()
+            raise Exception(f"Download failed {resp.status_code} {url}: {resp.text}")
             
-        async for chunk in resp.content.iter_chunked(1024):
-            sha256.update(chunk)
+        # Each chunk is hashed in a worker thread while the next one is received. hashlib
+        # releases the GIL, so several assets hash on separate cores; awaiting the previous
+        # update before queueing the next keeps them in order
+        async for chunk in resp.aiter_bytes(ASSET_CHUNK_SIZE):
+            if pending:
+                await pending
+            pending = loop.run_in_executor(None, sha256.update, chunk)
+        if pending:
+            await pending
     
     return sha256.hexdigest()
 
 async def fetch_html(session, url, **kwargs):
-    async with session.get(url, **kwargs) as resp:
-        if resp.status != 200:
-            return None
-        return await resp.text()
+    status, body = await fetch_cached(session, url, **kwargs)
+    if status != 200:
+        return None
+    return body
+
+# A single regex over the raw bytes instead of parsing the whole page on the event loop
+_OG_IMAGE_RE = re.compile(rb'<meta\s+property="og:image"\s+content="([^"]+)"')
 
 def get_social_preview_url(html):
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(html, "html.parser")
-    tag = soup.find("meta", property="og:image")
-    return tag.get("content") if tag else None
+    m = _OG_IMAGE_RE.search(html)
+    return unescape(m.group(1).decode()) if m else None
+
+# Compiled once instead of on every format_repo_name call
+_SM_PREFIX = re.compile(r"^(?:SM-)?(?:SM)?")  # Same as stripping `SM-` and then `SM`
+_SEP = re.compile(r"[-_]")
+_CAPSPLIT = re.compile(r"(?<!^)(?=[A-Z])")
+_API = re.compile(r"\bA P I\b")
+_WS = re.compile(r"\s+")
 
 def format_repo_name(name):
-    # First, remove `SM-` prefix if it exists
-    name = re.sub(r"^SM-", "", name)
-    name = re.sub(r"^SM", "", name)
+    # First, remove `SM-` and `SM` prefixes if they exist
+    name = _SM_PREFIX.sub("", name, count=1)
     
     # Then, replace either dashes or underscores with spaces
-    name = re.sub(r"[-_]", " ", name)
+    name = _SEP.sub(" ", name)
     
     # Add a space for every capital letter that is not followed by another capital letter
-    name = re.sub(r"(?<!^)(?=[A-Z])", " ", name)
+    name = _CAPSPLIT.sub(" ", name)
     
     # Finally, capitalize the first letter of each word
     name = name.title()
     
     # Replace "A P I" with "API"
-    name = re.sub(r"\bA P I\b", "API", name)
+    name = _API.sub("API", name)
     
     # Replace double spaces with single spaces
-    name = re.sub(r"\s+", " ", name).strip()
+    name = _WS.sub(" ", name).strip()
     
     return name
 
@@ -93,35 +233,120 @@ def format_repo_name(name):
 
 async def get_repo_data(session, repo_full_name):
     url = f"{GITHUB_API}/repos/{repo_full_name}"
-    return await fetch_json(session, url, headers=HEADERS(GITHUB_TOKEN))
+    return await fetch_json(session, url)
 
 async def get_releases(session, repo_full_name):
     # First try to get the release marked as "latest" by the repo owner
     latest_url = f"{GITHUB_API}/repos/{repo_full_name}/releases/latest"
     try:
-        latest_release = await fetch_json(session, latest_url, headers=HEADERS(GITHUB_TOKEN))
+        latest_release = await fetch_json(session, latest_url)
         # Return the latest release as the first item in an array for consistency with process_repo
         return [latest_release]
     except Exception as e:
         print(f"[WARNING] No 'latest' release found for {repo_full_name}, falling back to all releases: {e}")
         # Fall back to getting all releases if "latest" is not available
         all_releases_url = f"{GITHUB_API}/repos/{repo_full_name}/releases"
-        return await fetch_json(session, all_releases_url, headers=HEADERS(GITHUB_TOKEN))
+        return await fetch_json(session, all_releases_url)
 
 async def get_contributors(session, repo_full_name, max_count=30):
     url = f"{GITHUB_API}/repos/{repo_full_name}/contributors?per_page={max_count}"
-    users = await fetch_json(session, url, headers=HEADERS(GITHUB_TOKEN))
+    users = await fetch_json(session, url)
     return [user['login'] for user in users if user.get('type') == "User"]
 
 async def get_social_preview(session, repo_full_name):
-    html = await fetch_html(session, f"https://github.com/{repo_full_name}")
+    html = await fetch_html(session, f"https://github.com/{repo_full_name}", headers=_PAGE_HEADERS, auth=None)
     if not html:
         return None
     return get_social_preview_url(html)
 
-async def download_asset_and_hash(session, asset, expected_hash=None):
+# Everything process_repo needs from the repo and its latest release, minus contributors
+_REPO_BUNDLE_FRAGMENT = """
+fragment RepoBundle on Repository {
+  name
+  nameWithOwner
+  url
+  description
+  stargazerCount
+  latestRelease {
+    releaseAssets(first: 100) { nodes { name downloadUrl downloadCount } }
+  }
+}
+"""
+
+def _bundle_to_rest(node):
+    # Reshape a GraphQL repository node into the REST payloads process_repo works with
+    repo_json = {
+        "name": node["name"],
+        "full_name": node["nameWithOwner"],
+        "html_url": node["url"],
+        "description": node["description"],
+        "stargazers_count": node["stargazerCount"],
+    }
+    releases = None
+    if node.get("latestRelease"):
+        releases = [{
+            "assets": [
+                {
+                    "name": a["name"],
+                    "browser_download_url": a["downloadUrl"],
+                    "download_count": a["downloadCount"],
+                }
+                for a in node["latestRelease"]["releaseAssets"]["nodes"]
+            ]
+        }]
+    return repo_json, releases
+
+async def fetch_repo_bundles(session, repo_names):
+    # One aliased GraphQL document per batch instead of two REST calls per repo
+    bundles = {}
+    for start in range(0, len(repo_names), GRAPHQL_BATCH_SIZE):
+        batch = repo_names[start:start + GRAPHQL_BATCH_SIZE]
+        params, fields, variables = [], [], {}
+        for i, repo_name in enumerate(batch):
+            owner, name = repo_name.split("/", 1)
+            params.append(f"$o{i}: String!, $n{i}: String!")
+            fields.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ ...RepoBundle }}")
+            variables[f"o{i}"], variables[f"n{i}"] = owner, name
+        query = f"query({', '.join(params)}) {{ {' '.join(fields)} }}" + _REPO_BUNDLE_FRAGMENT
+
+        resp = await request_with_backoff(session, "POST", GITHUB_GRAPHQL, json={"query": query, "variables": variables})
+        if resp.status_code != 200:
+            raise Exception(f"HTTP {resp.status_code} for {GITHUB_GRAPHQL}: {resp.text}")
+        data = _json_loads(resp.content).get("data") or {}
+
+        # Repos GraphQL could not resolve are left out and fall back to REST
+        for i, repo_name in enumerate(batch):
+            if data.get(f"r{i}"):
+                bundles[repo_name] = _bundle_to_rest(data[f"r{i}"])
+    return bundles
+
+async def head_asset(session, url, **kwargs):
+    # Returns (etag, size) of the asset behind url, or (None, None) if the CDN won't say.
+    # Best-effort: a failed HEAD only means the asset gets downloaded and hashed.
     try:
-        h = await fetch_stream_hash(session, asset["browser_download_url"], headers=HEADERS(GITHUB_TOKEN))
+        resp = await session.head(url, **kwargs)
+    except httpx.HTTPError:
+        return None, None
+    if resp.status_code != 200:
+        return None, None
+    return resp.headers.get("ETag"), resp.headers.get("Content-Length")
+
+async def download_asset_and_hash(session, asset, expected_hash=None, sema=None):
+    url = asset["browser_download_url"]
+    try:
+        if sema: await sema.acquire()
+        try:
+            # A HEAD is enough to tell whether the asset changed since its hash was cached
+            etag, size = await head_asset(session, url)
+            cached = _asset_cache.get(url)
+            if etag and cached and cached["etag"] == etag and cached["size"] == size:
+                h = cached["sha256"]
+            else:
+                h = await fetch_stream_hash(session, url)
+                if etag:
+                    _asset_cache[url] = {"etag": etag, "size": size, "sha256": h}
+        finally:
+            if sema: sema.release()
         return {
             "name": asset["name"],
             "url": asset["browser_download_url"],
@@ -139,14 +364,17 @@ async def download_asset_and_hash(session, asset, expected_hash=None):
             "error": str(e)
         }
 
-async def process_repo(session, mod, sema=None):
-    repo_name = list(mod.keys())[0]
-    repo_data_spec = mod[repo_name]
+async def process_repo(session, asset_session, repo_name, repo_data_spec, sema=None, asset_sema=None, bundle=None):
+    expected_hashes = repo_data_spec.get("assets") or {}
     error = False
     try:
         if sema: await sema.acquire()
-        repo_json = await get_repo_data(session, repo_name)
-        releases = await get_releases(session, repo_name)
+        # Prefer the prefetched GraphQL bundle; REST covers misses and repos without a latest release
+        repo_json, releases = bundle or (None, None)
+        if repo_json is None:
+            repo_json = await get_repo_data(session, repo_name)
+        if releases is None:
+            releases = await get_releases(session, repo_name)
 
         downloads = []
         total_downloads = 0
@@ -157,9 +385,10 @@ async def process_repo(session, mod, sema=None):
             # Download assets concurrently with their expected hashes
             asset_hashes = await asyncio.gather(*[
                 download_asset_and_hash(
-                    session, 
+                    asset_session, 
                     asset, 
-                    repo_data_spec.get("assets", {}).get(asset["name"])
+                    expected_hashes.get(asset["name"]),
+                    asset_sema
                 ) for asset in assets
             ])
             downloads.extend(asset_hashes)
@@ -178,7 +407,7 @@ async def process_repo(session, mod, sema=None):
         # Validate asset hashes
         mismatched_hashes = []
         for download in downloads:
-            expected_hash = repo_data_spec.get("assets", {}).get(download["name"])
+            expected_hash = expected_hashes.get(download["name"])
             if expected_hash:
                 download["validHash"] = expected_hash
                 if download["currentHash"] != expected_hash:
@@ -204,6 +433,8 @@ async def process_repo(session, mod, sema=None):
             "icon": icon,
             "mismatched_hashes": mismatched_hashes,
         }
+        # Hand-maintained fields from config.json win over what GitHub reports
+        result.update(repo_data_spec.get("overrides") or {})
         return result, error
     except Exception as e:
         print(f"\n[⚠️  ERROR] Failed to process {repo_name}: {e}")
@@ -214,8 +445,11 @@ async def process_repo(session, mod, sema=None):
 async def main():
     print("\n📦 Starting mod processing...\n")
     start_time = datetime.now()
-    async with aiofiles.open("config.json", "r") as c:
-        config = json.loads(await c.read())
+    async with aiofiles.open("config.json", "rb") as c:
+        config = _json_loads(await c.read())
+    # config.json is a list of single-key {repo_name: spec} dicts; unpack each once
+    repos = [next(iter(mod.items())) for mod in config]
+    await load_etag_cache()
 
     output_file = "repos-gen2.json"
     jsons = []
@@ -224,11 +458,36 @@ async def main():
     mismatch_count = 0
     details = []
 
-    connector = aiohttp.TCPConnector(limit=16)
-    sema = asyncio.Semaphore(8)
+    sema = asyncio.Semaphore(MAX_CONCURRENT_REPOS)
+    # Shared by every repo, so bandwidth isn't split across dozens of simultaneous downloads
+    asset_sema = asyncio.Semaphore(ASSET_DOWNLOAD_CONCURRENCY)
 
-    async with aiohttp.ClientSession(connector=connector) as session:
-        tasks = [process_repo(session, mod, sema) for mod in config]
+    # API and page requests share one multiplexed HTTP/2 connection per host; release
+    # assets are redirected to a CDN where HTTP/2 buys nothing, so they get a plain client
+    async with httpx.AsyncClient(
+        http2=True,
+        headers=_HEADERS,
+        auth=_token_auth,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    ) as session, httpx.AsyncClient(
+        headers=_ASSET_HEADERS,
+        auth=_token_auth,
+        limits=httpx.Limits(max_connections=ASSET_DOWNLOAD_CONCURRENCY),
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+    ) as asset_session:
+        try:
+            bundles = await fetch_repo_bundles(session, [repo_name for repo_name, _ in repos])
+        except Exception as e:
+            print(f"[WARNING] GraphQL prefetch failed, falling back to REST for every repo: {e}")
+            bundles = {}
+
+        tasks = [
+            process_repo(session, asset_session, repo_name, spec, sema, asset_sema, bundles.get(repo_name))
+            for repo_name, spec in repos
+        ]
         for coro in tqdm.as_completed(tasks, total=len(tasks), desc="🔍 Processing mods"):
             repo_json, error = await coro
             if repo_json:
@@ -242,9 +501,11 @@ async def main():
             if error:
                 error_found = True
 
+    await save_etag_cache()
+
     print(f"\n📝 Writing output to {output_file}...\n")
-    async with aiofiles.open(output_file, "w") as f:
-        await f.write(json.dumps(jsons, indent=4))
+    async with aiofiles.open(output_file, "wb") as f:
+        await f.write(_json_dumps_pretty(jsons))
 
     elapsed = datetime.now() - start_time
     print("\n====== Mod Processing Complete ======")